@@ -179,6 +179,9 @@ fi
 echo ""
 print_step "Running StitchKit setup..."
 
+# Always remove the downloaded installer, even if a later step fails
+trap 'rm -f /tmp/install_stitchkit.py' EXIT
+
 # Download the Python installer from the public installer repository
 print_step "Downloading Python installer..."
 if curl -fsSL https://raw.githubusercontent.com/UniversityOfSaintThomas/StitchKit-Installer/main/install_stitchkit.py -o /tmp/install_stitchkit.py; then
@@ -187,14 +190,18 @@ if curl -fsSL https://raw.githubusercontent.com/UniversityOfSaintThomas/StitchKi
     echo ""
     
     # Run the Python installer
+    # Note: when credentials are configured, the installer replaces itself
+    # with StitchKit, so this is StitchKit's exit status in that case
+    SETUP_STATUS=0
     if [ "$VERBOSE" = true ]; then
-        python3 /tmp/install_stitchkit.py --verbose
+        python3 /tmp/install_stitchkit.py --verbose || SETUP_STATUS=$?
     else
-        python3 /tmp/install_stitchkit.py
+        python3 /tmp/install_stitchkit.py || SETUP_STATUS=$?
     fi
     
-    # Clean up
-    rm -f /tmp/install_stitchkit.py
+    if [ "$SETUP_STATUS" -ne 0 ]; then
+        print_warning "StitchKit setup exited with status $SETUP_STATUS"
+    fi
 else
     print_warning "Could not download Python installer"
     print_step "Running basic setup..."
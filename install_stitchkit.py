@@ -6,20 +6,196 @@ University of St. Thomas
 """
 
 import os
+import re
 import sys
 import subprocess
 import shutil
+import hashlib
 import json
+import mmap
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+from enum import Enum
+
+# Oldest pip we install with; anything older is upgraded alongside requirements
+MIN_PIP_VERSION = (23, 0)
+
+# requirements.txt comments, and lines too complex to install on their own
+REQUIREMENT_COMMENT_RE = re.compile(r'(^|\s)#.*$')
+NON_PLAIN_REQUIREMENT_RE = re.compile(r'[@/\\]|\s-')
+REQUIREMENT_NAME_END_RE = re.compile(r'[\[<>=!~; ]')
+
+# Non-interactive pip options: no self-version check round-trip, no prompts,
+# and prefer wheels over building sdists
+PIP_INSTALL_OPTIONS = [
+    "--disable-pip-version-check",
+    "--no-input",
+    "--quiet",
+    "--prefer-binary",
+]
+
+# Required .env credentials, mapped to the placeholder value in ENV_TEMPLATE
+REQUIRED_CREDENTIALS = {
+    b'CANVAS_API_KEY': b'your_canvas_api_key_here',
+    b'HONORLOCK_CONSUMER_KEY': b'your_honorlock_consumer_key_here',
+    b'HONORLOCK_SHARED_SECRET': b'your_honorlock_shared_secret_here',
+}
+
+# Unquoted .env comment: '#' at value start or after whitespace
+ENV_COMMENT_RE = re.compile(rb'(^|\s)#.*$')
+
+# Shell startup file that receives the stitchkit alias, by shell name
+RC_BY_SHELL = {
+    'zsh': '.zshrc',
+    'bash': '.bashrc',
+    'fish': '.config/fish/config.fish',
+}
+
+# Template for a fresh .env file
+ENV_TEMPLATE = """################################################################################
+#                                                                              #
+#                    🎓 StitchKit Environment Configuration 🎓                 #
+#                        University of St. Thomas                             #
+#                                                                              #
+################################################################################
+
+#===============================================================================
+# 🚀 APPLICATION SETTINGS
+#===============================================================================
+
+# Application name and branding
+STITCHKIT_APP_NAME=StitchKit
+STITCHKIT_APP_FULL_NAME=St. Thomas Instructional Technology Command Hub Kit
+
+# Logging level: DEBUG, INFO, WARNING, ERROR, CRITICAL
+STITCHKIT_LOG_LEVEL=INFO
+
+#===============================================================================
+# 🎨 CANVAS CONFIGURATION - MAIN
+#===============================================================================
+
+# [REQUIRED] Your Canvas API Key
+# 📝 How to get your Canvas API key:
+#    1. Log into Canvas (https://stthomas.instructure.com)
+#    2. Click on "Account" in the left sidebar
+#    3. Click on "Settings"
+#    4. Scroll down to "Approved Integrations"
+#    5. Click "+ New Access Token"
+#    6. Enter a purpose (e.g., "StitchKit Admin Tools")
+#    7. Leave expiration blank for permanent token (or set a date)
+#    8. Click "Generate Token"
+#    9. ⚠️ COPY THE TOKEN NOW - you won't see it again!
+#    10. Paste it below
+CANVAS_API_KEY=your_canvas_api_key_here
+
+# Your Canvas instance URL
+CANVAS_BASE_URL=https://stthomas.instructure.com
+
+# Your Canvas Account ID (usually 1 for main account)
+CANVAS_ACCOUNT_ID=1
+
+#===============================================================================
+# 🔄 CANVAS MULTI-ENVIRONMENT SETUP (Future Feature)
+#===============================================================================
+# Note: These are placeholders for future multi-environment support
+# They are NOT currently active in StitchKit
+
+# Production Environment (future feature)
+CANVAS_PROD_API_KEY=your_production_api_key_here
+CANVAS_PROD_BASE_URL=https://stthomas.instructure.com
+CANVAS_PROD_ACCOUNT_ID=1
+
+# Test Environment (future feature)
+CANVAS_TEST_API_KEY=your_test_api_key_here
+CANVAS_TEST_BASE_URL=https://stthomas.test.instructure.com
+CANVAS_TEST_ACCOUNT_ID=1
+
+# Default environment selection (future feature)
+CANVAS_DEFAULT_ENV=test
+
+# Canvas integration toggle
+CANVAS_ENABLED=true
+
+#===============================================================================
+# 📚 CANVAS CATALOG INTEGRATION
+#===============================================================================
+
+# [OPTIONAL] Canvas Catalog API Token
+# 📝 How to get your Canvas Catalog token:
+#    1. Log into Canvas Catalog admin
+#    2. Navigate to Admin → Settings → API Access
+#    3. Generate a new API token
+#    4. Copy and paste it here
+CANVAS_CAT_API_TOKEN=your_canvas_catalog_token_here
+
+#===============================================================================
+# 🛡️ HONORLOCK INTEGRATION
+#===============================================================================
+
+# [REQUIRED] Honorlock Consumer Key
+# 📝 How to get Honorlock credentials:
+#    1. Contact your Honorlock representative
+#    2. Request LTI integration credentials for your institution
+#    3. They will provide the consumer key and shared secret
+HONORLOCK_CONSUMER_KEY=your_honorlock_consumer_key_here
+
+# [REQUIRED] Honorlock Shared Secret
+# ⚠️ Keep this secret! Do not share or commit to version control
+HONORLOCK_SHARED_SECRET=your_honorlock_shared_secret_here
+
+# Honorlock Configuration URL (typically the same for all institutions)
+HONORLOCK_CONFIG_URL=https://app.honorlock.com/lti_config
+
+#===============================================================================
+# 📝 IMPORTANT NOTES
+#===============================================================================
+# 
+# ⚠️ REQUIRED FIELDS:
+#    • CANVAS_API_KEY - Must be set for StitchKit to function
+#    • HONORLOCK_CONSUMER_KEY - Required for Honorlock integration
+#    • HONORLOCK_SHARED_SECRET - Required for Honorlock integration
+#
+# 💡 SECURITY REMINDER:
+#    • Never commit this .env file to Git
+#    • Keep your API keys secret and secure
+#    • This file contains sensitive credentials
+#
+#===============================================================================
+""".encode('utf-8')
+
+class InstallState(Enum):
+    """Outcome of checking for an existing installation"""
+    FRESH = "fresh"
+    EXISTS_KEPT = "exists_kept"
+    EXISTS_BACKED_UP = "exists_backed_up"
 
 class StitchKitInstaller:
+    # Colored status prefixes, built once for all print_* calls
+    _PREFIX = {
+        'success': '\033[92m✓\033[0m',
+        'error': '\033[91m✗\033[0m',
+        'warning': '\033[93m⚠\033[0m',
+        'info': '\033[94mℹ\033[0m'
+    }
+    _SUCCESS_PREFIX = _PREFIX['success']
+    _ERROR_PREFIX = _PREFIX['error']
+    _WARNING_PREFIX = _PREFIX['warning']
+    _INFO_PREFIX = _PREFIX['info']
+    
     def __init__(self):
-        self.install_dir = Path.home() / "StitchKit"
+        self.home = Path.home()
+        self.install_dir = self.home / "StitchKit"
+        self.env_file = self.install_dir / ".env"
+        self.install_dir_str = str(self.install_dir)
+        self.env_file_str = str(self.env_file)
         self.verbose = False
-        self.env_restored = False  # Track if .env was restored
+        self.parallel_downloads = 8  # Max concurrent pip installs
+        self.reinstall = False  # Ignore the installed-dependencies marker
         self.env_has_credentials = False  # Track if credentials are valid
+        self._env_cred_cache = None  # (mtime_ns, size, result) of last .env check
         
     def print_header(self, text):
         """Print a formatted header"""
@@ -29,26 +205,20 @@ class StitchKitInstaller:
         
     def print_status(self, message, status="info"):
         """Print colored status messages"""
-        colors = {
-            'success': '\033[92m✓\033[0m',
-            'error': '\033[91m✗\033[0m',
-            'warning': '\033[93m⚠\033[0m',
-            'info': '\033[94mℹ\033[0m'
-        }
-        prefix = colors.get(status, '')
+        prefix = self._PREFIX.get(status, '')
         print(f"{prefix} {message}")
         
     def print_success(self, message):
-        self.print_status(message, "success")
+        print(f"{self._SUCCESS_PREFIX} {message}")
         
     def print_error(self, message):
-        self.print_status(message, "error")
+        print(f"{self._ERROR_PREFIX} {message}")
         
     def print_warning(self, message):
-        self.print_status(message, "warning")
+        print(f"{self._WARNING_PREFIX} {message}")
         
     def print_info(self, message):
-        self.print_status(message, "info")
+        print(f"{self._INFO_PREFIX} {message}")
         
     def check_python_version(self):
         """Check if Python version meets requirements"""
@@ -60,12 +230,11 @@ class StitchKitInstaller:
         
     def check_existing_installation(self):
         """Check for existing StitchKit installation"""
-        if self.install_dir.exists():
+        if os.path.isdir(self.install_dir_str):
             self.print_warning(f"StitchKit already installed at {self.install_dir}")
             
             # Check for .env file to preserve
-            env_file = self.install_dir / ".env"
-            if env_file.exists():
+            if os.path.exists(self.env_file_str):
                 self.print_info("Found existing .env configuration file")
                 
             response = input("\nBackup existing installation? (y/n): ").lower()
@@ -74,17 +243,24 @@ class StitchKitInstaller:
                 if backup_dir:
                     # Try to restore .env from backup later
                     self.restore_env_from_backup()
-            return True
-        return False
+                    return InstallState.EXISTS_BACKED_UP
+            return InstallState.EXISTS_KEPT
+        return InstallState.FRESH
         
     def backup_existing(self):
         """Backup existing installation"""
         timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        backup_dir = Path.home() / f"StitchKit.backup-{timestamp}"
+        backup_dir = self.home / f"StitchKit.backup-{timestamp}"
         
         try:
             self.print_info(f"Creating backup at {backup_dir}")
-            shutil.move(str(self.install_dir), str(backup_dir))
+            try:
+                # Same filesystem as $HOME, so a rename is a single syscall
+                os.rename(self.install_dir, backup_dir)
+            except OSError:
+                # Cross-device (EXDEV): fall back to copy + delete. copy2
+                # already uses the kernel's sendfile/fcopyfile fast paths
+                shutil.move(str(self.install_dir), str(backup_dir), copy_function=shutil.copy2)
             self.print_success("Backup created successfully")
             return backup_dir
         except Exception as e:
@@ -93,26 +269,32 @@ class StitchKitInstaller:
             
     def restore_env_from_backup(self):
         """Check for and restore .env from backup"""
-        # Look for recent backups
-        backup_pattern = "StitchKit.backup-*"
-        backups = sorted(Path.home().glob(backup_pattern))
-        
-        if not backups:
+        # Look for recent backups in a single directory read. Timestamped
+        # names sort chronologically, so the max name is the newest
+        backup_prefix = "StitchKit.backup-"
+        with os.scandir(self.home) as entries:
+            latest = max(
+                (e for e in entries if e.name.startswith(backup_prefix) and e.is_dir()),
+                default=None,
+                key=lambda e: e.name
+            )
+            
+        if latest is None:
             return False
             
-        latest_backup = backups[-1]
+        latest_backup = Path(latest.path)
         backup_env = latest_backup / ".env"
         
-        if backup_env.exists():
+        if os.path.isfile(backup_env):
             self.print_warning(f"Found backup configuration in {latest_backup.name}")
             response = input("Restore your API credentials from backup? (y/n): ").lower()
             
             if response == 'y':
                 # Ensure install directory exists
                 self.install_dir.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(backup_env, self.install_dir / ".env")
+                shutil.copy2(backup_env, self.env_file)
+                self._env_cred_cache = None  # copy2 keeps the backup's mtime
                 self.print_success("Configuration restored from backup")
-                self.env_restored = True
                 
                 # Check if the restored .env has valid credentials
                 self.env_has_credentials = self.check_env_credentials()
@@ -122,51 +304,196 @@ class StitchKitInstaller:
         
     def check_env_credentials(self):
         """Check if .env has the required credentials filled in"""
-        env_file = self.install_dir / ".env"
-        if not env_file.exists():
+        try:
+            st = os.stat(self.env_file_str)
+        except OSError:
             return False
             
+        # Reuse the last result while the file is unchanged
+        stamp = (st.st_mtime_ns, st.st_size)
+        if self._env_cred_cache and self._env_cred_cache[:2] == stamp:
+            return self._env_cred_cache[2]
+            
+        missing = set(REQUIRED_CREDENTIALS)
+        
         try:
-            with open(env_file, 'r') as f:
-                content = f.read()
+            # The file is small and its size is known: one read, no decoding
+            fd = os.open(self.env_file_str, os.O_RDONLY)
+            try:
+                data = os.read(fd, st.st_size)
+            finally:
+                os.close(fd)
                 
-            # Check for required credentials (not just placeholders)
-            has_canvas = 'CANVAS_API_KEY=' in content and 'your_canvas_api_key_here' not in content
-            has_honorlock_key = 'HONORLOCK_CONSUMER_KEY=' in content and 'your_honorlock_consumer_key_here' not in content
-            has_honorlock_secret = 'HONORLOCK_SHARED_SECRET=' in content and 'your_honorlock_shared_secret_here' not in content
-            
-            # All three required fields must be present and not placeholders
-            return has_canvas and has_honorlock_key and has_honorlock_secret
+            for line in data.splitlines():
+                # Check for required credentials (not just placeholders).
+                # As with python-dotenv, the last assignment of a key wins
+                name, sep, value = line.partition(b'=')
+                name = name.strip()
+                if name.startswith(b'export '):
+                    name = name[len(b'export '):].strip()
+                placeholder = REQUIRED_CREDENTIALS.get(name)
+                if placeholder is None or not sep:
+                    continue
+                value = self.env_value(value)
+                if value and value != placeholder:
+                    missing.discard(name)
+                else:
+                    missing.add(name)
+                    
+            # All required fields must be present and not placeholders
+            result = not missing
+            self._env_cred_cache = stamp + (result,)
+            return result
         except Exception:
             return False
             
+    def env_value(self, raw):
+        """Unquote a raw .env value and drop any trailing comment, as dotenv does"""
+        value = raw.strip()
+        quote = value[:1]
+        if quote in (b'"', b"'"):
+            end = value.find(quote, 1)
+            if end != -1:
+                return value[1:end]
+        return ENV_COMMENT_RE.sub(b'', value).strip()
+        
+    def pip_install_command(self, *args):
+        """Build a pip install command line for the running interpreter"""
+        return [sys.executable, "-m", "pip", "install", *PIP_INSTALL_OPTIONS, *args]
+        
+    def pip_needs_upgrade(self):
+        """Check if the installed pip is older than MIN_PIP_VERSION"""
+        try:
+            try:
+                from importlib.metadata import version
+                pip_version = version('pip')
+            except ImportError:
+                # Python 3.7 has no importlib.metadata
+                import pip
+                pip_version = pip.__version__
+            parts = tuple(int(p) for p in pip_version.split('.')[:2] if p.isdigit())
+            return parts < MIN_PIP_VERSION
+        except Exception:
+            return True
+            
+    def read_requirements(self, requirements_file):
+        """Return plain requirement specifiers, or None if the file can't be sharded"""
+        reqs = []
+        with open(requirements_file, 'r') as f:
+            for line in f:
+                # Like pip, '#' only starts a comment at line start or after whitespace
+                line = REQUIREMENT_COMMENT_RE.sub('', line).strip()
+                if not line:
+                    continue
+                # Options (-r, -e, --index-url, ...) apply to the whole file, and
+                # hashes or line continuations put pip in whole-file modes
+                if line.startswith('-') or '--hash' in line or line.endswith('\\'):
+                    return None
+                # URL, VCS, path and per-requirement option lines are left
+                # to the resolving pass
+                if NON_PLAIN_REQUIREMENT_RE.search(line):
+                    continue
+                reqs.append(line)
+                
+        # Two pip processes must never write the same distribution at once,
+        # so names listed more than once are left to the resolving pass
+        names = [self.requirement_name(req) for req in reqs]
+        counts = Counter(names)
+        return [req for req, name in zip(reqs, names) if counts[name] == 1]
+        
+    def requirement_name(self, req):
+        """Return the normalized distribution name of a requirement specifier"""
+        name = REQUIREMENT_NAME_END_RE.split(req, 1)[0]
+        return re.sub(r'[-_.]+', '-', name).lower()
+        
+    def install_requirements_parallel(self, reqs):
+        """Install requirements concurrently, returning the ones that failed"""
+        def install_one(req):
+            result = subprocess.run(
+                self.pip_install_command("--no-deps", req),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+            return req, result.returncode
+            
+        workers = min(self.parallel_downloads, len(reqs))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(install_one, reqs))
+            
+        return [req for req, returncode in results if returncode != 0]
+        
     def install_dependencies(self):
         """Install Python dependencies"""
         requirements_file = self.install_dir / "requirements.txt"
+        lock_file = self.install_dir / "requirements.lock"
         
-        if not requirements_file.exists():
+        has_lock = os.path.isfile(lock_file)
+        if not has_lock and not os.path.isfile(requirements_file):
             self.print_warning("requirements.txt not found")
             return True
             
+        # Skip pip entirely if this exact file was installed for this interpreter.
+        # sys.executable is often a stable symlink, so the version and prefix
+        # are included to notice an interpreter upgraded behind it
+        source_file = lock_file if has_lock else requirements_file
+        marker_file = self.install_dir / ".stitchkit_deps.sha256"
+        try:
+            with open(source_file, 'rb') as f:
+                stamp = "\n".join([
+                    hashlib.sha256(f.read()).hexdigest(),
+                    sys.executable,
+                    sys.version,
+                    sys.prefix,
+                ])
+        except OSError:
+            stamp = None  # Can't fingerprint; just let pip run
+            
+        if stamp and not self.reinstall:
+            try:
+                if marker_file.read_text() == stamp:
+                    self.print_success("Dependencies already up to date")
+                    return True
+            except OSError:
+                pass
+            
         self.print_info("Installing Python dependencies...")
         
         try:
-            # First upgrade pip
-            subprocess.run(
-                [sys.executable, "-m", "pip", "install", "--upgrade", "pip"],
-                capture_output=True,
-                check=False
-            )
-            
-            # Install requirements
+            if has_lock:
+                # Pre-resolved, hashed lockfile: skip the resolver and sdist builds
+                cmd = self.pip_install_command(
+                    "--no-deps", "--require-hashes", "--only-binary=:all:",
+                    "-r", str(lock_file)
+                )
+            else:
+                # Install top-level requirements concurrently
+                reqs = self.read_requirements(requirements_file)
+                if reqs and self.parallel_downloads > 1:
+                    failed = self.install_requirements_parallel(reqs)
+                    if failed and self.verbose:
+                        self.print_info(f"Retrying serially: {', '.join(failed)}")
+                        
+                # Resolve remaining and transitive dependencies in one pass,
+                # upgrading pip in the same invocation only when it's outdated
+                cmd = self.pip_install_command()
+                if self.pip_needs_upgrade():
+                    # A specifier, not --upgrade, so other requirements aren't upgraded
+                    cmd.append("pip>=" + ".".join(map(str, MIN_PIP_VERSION)))
+                cmd += ["-r", str(requirements_file)]
+                
             result = subprocess.run(
-                [sys.executable, "-m", "pip", "install", "-r", str(requirements_file)],
+                cmd,
                 capture_output=True,
                 text=True
             )
             
             if result.returncode == 0:
                 self.print_success("Dependencies installed successfully")
+                if stamp:
+                    try:
+                        marker_file.write_text(stamp)
+                    except OSError:
+                        pass
                 return True
             else:
                 self.print_error(f"Failed to install dependencies: {result.stderr}")
@@ -178,132 +505,20 @@ class StitchKitInstaller:
             
     def create_basic_env(self):
         """Create a basic .env file with user-friendly formatting"""
-        env_content = """################################################################################
-#                                                                              #
-#                    🎓 StitchKit Environment Configuration 🎓                 #
-#                        University of St. Thomas                             #
-#                                                                              #
-################################################################################
-
-#===============================================================================
-# 🚀 APPLICATION SETTINGS
-#===============================================================================
-
-# Application name and branding
-STITCHKIT_APP_NAME=StitchKit
-STITCHKIT_APP_FULL_NAME=St. Thomas Instructional Technology Command Hub Kit
-
-# Logging level: DEBUG, INFO, WARNING, ERROR, CRITICAL
-STITCHKIT_LOG_LEVEL=INFO
-
-#===============================================================================
-# 🎨 CANVAS CONFIGURATION - MAIN
-#===============================================================================
-
-# [REQUIRED] Your Canvas API Key
-# 📝 How to get your Canvas API key:
-#    1. Log into Canvas (https://stthomas.instructure.com)
-#    2. Click on "Account" in the left sidebar
-#    3. Click on "Settings"
-#    4. Scroll down to "Approved Integrations"
-#    5. Click "+ New Access Token"
-#    6. Enter a purpose (e.g., "StitchKit Admin Tools")
-#    7. Leave expiration blank for permanent token (or set a date)
-#    8. Click "Generate Token"
-#    9. ⚠️ COPY THE TOKEN NOW - you won't see it again!
-#    10. Paste it below
-CANVAS_API_KEY=your_canvas_api_key_here
-
-# Your Canvas instance URL
-CANVAS_BASE_URL=https://stthomas.instructure.com
-
-# Your Canvas Account ID (usually 1 for main account)
-CANVAS_ACCOUNT_ID=1
-
-#===============================================================================
-# 🔄 CANVAS MULTI-ENVIRONMENT SETUP (Future Feature)
-#===============================================================================
-# Note: These are placeholders for future multi-environment support
-# They are NOT currently active in StitchKit
-
-# Production Environment (future feature)
-CANVAS_PROD_API_KEY=your_production_api_key_here
-CANVAS_PROD_BASE_URL=https://stthomas.instructure.com
-CANVAS_PROD_ACCOUNT_ID=1
-
-# Test Environment (future feature)
-CANVAS_TEST_API_KEY=your_test_api_key_here
-CANVAS_TEST_BASE_URL=https://stthomas.test.instructure.com
-CANVAS_TEST_ACCOUNT_ID=1
-
-# Default environment selection (future feature)
-CANVAS_DEFAULT_ENV=test
-
-# Canvas integration toggle
-CANVAS_ENABLED=true
-
-#===============================================================================
-# 📚 CANVAS CATALOG INTEGRATION
-#===============================================================================
-
-# [OPTIONAL] Canvas Catalog API Token
-# 📝 How to get your Canvas Catalog token:
-#    1. Log into Canvas Catalog admin
-#    2. Navigate to Admin → Settings → API Access
-#    3. Generate a new API token
-#    4. Copy and paste it here
-CANVAS_CAT_API_TOKEN=your_canvas_catalog_token_here
-
-#===============================================================================
-# 🛡️ HONORLOCK INTEGRATION
-#===============================================================================
-
-# [REQUIRED] Honorlock Consumer Key
-# 📝 How to get Honorlock credentials:
-#    1. Contact your Honorlock representative
-#    2. Request LTI integration credentials for your institution
-#    3. They will provide the consumer key and shared secret
-HONORLOCK_CONSUMER_KEY=your_honorlock_consumer_key_here
-
-# [REQUIRED] Honorlock Shared Secret
-# ⚠️ Keep this secret! Do not share or commit to version control
-HONORLOCK_SHARED_SECRET=your_honorlock_shared_secret_here
-
-# Honorlock Configuration URL (typically the same for all institutions)
-HONORLOCK_CONFIG_URL=https://app.honorlock.com/lti_config
-
-#===============================================================================
-# 📝 IMPORTANT NOTES
-#===============================================================================
-# 
-# ⚠️ REQUIRED FIELDS:
-#    • CANVAS_API_KEY - Must be set for StitchKit to function
-#    • HONORLOCK_CONSUMER_KEY - Required for Honorlock integration
-#    • HONORLOCK_SHARED_SECRET - Required for Honorlock integration
-#
-# 💡 SECURITY REMINDER:
-#    • Never commit this .env file to Git
-#    • Keep your API keys secret and secure
-#    • This file contains sensitive credentials
-#
-#===============================================================================
-"""
-        env_file = self.install_dir / ".env"
-        with open(env_file, 'w') as f:
-            f.write(env_content)
+        self._env_cred_cache = None
+        
+        # Credentials file: create it readable by the owner only
+        fd = os.open(self.env_file_str, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            # Buffered write() retries short writes until the template is out
+            f.write(ENV_TEMPLATE)
             
         self.print_success("Created .env configuration file")
         
     def setup_environment(self):
         """Setup environment configuration"""
-        env_file = self.install_dir / ".env"
-        
-        # If .env was restored from backup, we're done
-        if self.env_restored and env_file.exists():
-            return True
-            
-        # If no .env exists, create one
-        if not env_file.exists():
+        # Keep an existing .env (e.g. restored from backup), otherwise create one
+        if not os.path.exists(self.env_file_str):
             self.create_basic_env()
             
         return True
@@ -312,30 +527,32 @@ HONORLOCK_CONFIG_URL=https://app.honorlock.com/lti_config
         """Create stitchkit alias for easy access"""
         try:
             # Detect shell
-            shell = os.environ.get('SHELL', '/bin/bash')
+            shell = os.path.basename(os.environ.get('SHELL', '/bin/bash'))
+            rc_name = RC_BY_SHELL.get(shell, '.profile')
+            rc_file = self.home / rc_name
             
-            if 'zsh' in shell:
-                rc_file = Path.home() / '.zshrc'
-            elif 'bash' in shell:
-                rc_file = Path.home() / '.bashrc'
-            else:
-                rc_file = Path.home() / '.profile'
-                
             alias_line = 'alias stitchkit="cd ~/StitchKit && python3 main.py"'
             
-            # Check if alias already exists
-            if rc_file.exists():
-                with open(rc_file, 'r') as f:
-                    if 'alias stitchkit=' in f.read():
+            # Check if alias already exists (mmap can't map an empty file)
+            try:
+                rc_size = os.path.getsize(rc_file)
+            except OSError:
+                rc_size = 0
+                
+            if rc_size:
+                with open(rc_file, 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if mm.find(b'alias stitchkit=') != -1:
                         self.print_info("Alias 'stitchkit' already exists")
                         return
                         
             # Add alias
+            rc_file.parent.mkdir(parents=True, exist_ok=True)
             with open(rc_file, 'a') as f:
                 f.write(f'\n# StitchKit alias\n{alias_line}\n')
                 
-            self.print_success(f"Created 'stitchkit' alias in {rc_file.name}")
-            self.print_info(f"Note: Run 'source ~/{rc_file.name}' or restart terminal to use alias")
+            self.print_success(f"Created 'stitchkit' alias in {rc_name}")
+            self.print_info(f"Note: Run 'source ~/{rc_name}' or restart terminal to use alias")
             
         except Exception as e:
             self.print_warning(f"Could not create alias: {e}")
@@ -361,17 +578,19 @@ HONORLOCK_CONFIG_URL=https://app.honorlock.com/lti_config
         input("Press Enter to open the editor...")
         
         # Open nano
-        env_file = self.install_dir / ".env"
         try:
-            subprocess.call(['nano', str(env_file)])
+            subprocess.call(['nano', self.env_file_str])
         except FileNotFoundError:
             # If nano isn't available, try vi
             try:
-                subprocess.call(['vi', str(env_file)])
+                subprocess.call(['vi', self.env_file_str])
             except FileNotFoundError:
                 self.print_error("No text editor found. Please edit .env manually")
                 return
                 
+        # The editor may have changed the file within the same mtime tick
+        self._env_cred_cache = None
+        
         # Check if they added credentials
         self.env_has_credentials = self.check_env_credentials()
         
@@ -393,6 +612,25 @@ HONORLOCK_CONFIG_URL=https://app.honorlock.com/lti_config
         print("   Or use the alias: stitchkit")
         print("\nFor help, see the README or contact IT support.")
         
+    def launch_stitchkit(self):
+        """Replace the installer process with StitchKit"""
+        try:
+            os.chdir(self.install_dir)
+            
+            # exec discards anything still buffered
+            sys.stdout.flush()
+            sys.stderr.flush()
+            
+            try:
+                # Does not return: the exit status becomes StitchKit's
+                os.execv(sys.executable, [sys.executable, 'main.py'])
+            except OSError:
+                # exec not possible here, run StitchKit as a child instead
+                subprocess.call([sys.executable, 'main.py'])
+        except Exception as e:
+            self.print_error(f"Could not launch StitchKit: {e}")
+            self.show_manual_next_steps()
+            
     def run(self):
         """Main installation process"""
         self.print_header("StitchKit Python Installer")
@@ -401,17 +639,28 @@ HONORLOCK_CONFIG_URL=https://app.honorlock.com/lti_config
         if '--verbose' in sys.argv:
             self.verbose = True
             
+        if '--parallel-downloads' in sys.argv:
+            try:
+                value = sys.argv[sys.argv.index('--parallel-downloads') + 1]
+                self.parallel_downloads = max(1, int(value))
+            except (IndexError, ValueError):
+                self.print_warning("--parallel-downloads expects a number; using default")
+                
+        if '--reinstall' in sys.argv:
+            self.reinstall = True
+            
         # Step 1: Check Python version
         if not self.check_python_version():
             return False
             
         # Step 2: Check for existing installation
-        self.check_existing_installation()
+        state = self.check_existing_installation()
         
-        # Step 3: Ensure install directory exists
-        if not self.install_dir.exists():
+        # Step 3: Ensure install directory exists. Only a kept installation
+        # already has it; a backed-up one was moved away
+        if state is not InstallState.EXISTS_KEPT:
             self.print_info(f"Creating installation directory at {self.install_dir}")
-            self.install_dir.mkdir(parents=True, exist_ok=True)
+        self.install_dir.mkdir(parents=True, exist_ok=True)
             
         # Step 4: Install dependencies
         if not self.install_dependencies():
@@ -440,12 +689,7 @@ HONORLOCK_CONFIG_URL=https://app.honorlock.com/lti_config
             time.sleep(2)
             
             # Launch StitchKit
-            try:
-                os.chdir(self.install_dir)
-                subprocess.call([sys.executable, 'main.py'])
-            except Exception as e:
-                self.print_error(f"Could not launch StitchKit: {e}")
-                self.show_manual_next_steps()
+            self.launch_stitchkit()
                 
         else:
             # User needs to configure credentials
@@ -460,12 +704,7 @@ HONORLOCK_CONFIG_URL=https://app.honorlock.com/lti_config
                     # They successfully added credentials
                     print("\nLaunching StitchKit...")
                     time.sleep(1)
-                    try:
-                        os.chdir(self.install_dir)
-                        subprocess.call([sys.executable, 'main.py'])
-                    except Exception as e:
-                        self.print_error(f"Could not launch StitchKit: {e}")
-                        self.show_manual_next_steps()
+                    self.launch_stitchkit()
                 else:
                     # They still need to configure
                     self.show_manual_next_steps()